@@ -1,6 +1,62 @@
 # document_loader.py - Load and split documents into chunks
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+import codecs
+import mmap
+import os
+import re
+
+# Size of the blocks read when streaming a file (1 MiB)
+READ_BLOCK_SIZE = 1 << 20
+
+# Break points, strongest first. Sentence breaks keep their
+# punctuation in the chunk (hence the +1 offset).
+SEPARATORS = (("\n\n", 0), ("\n", 0), (". ", 1), (" ", 0))
+
+# Any break point, and any non-whitespace character
+BREAK_RE = re.compile(r'\n\n|\n|(?<=[.!?])\s+| ')
+NON_SPACE_RE = re.compile(r'\S')
+
+def read_text_mmap(file_path):
+    """
+    Read a UTF-8 text file through a memory map.
+    
+    Args:
+        file_path: Path to the text file
+    
+    Returns:
+        String containing the file contents
+    """
+    with open(file_path, 'rb') as file:
+        # mmap can't map an empty file
+        if os.fstat(file.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.read().decode('utf-8', errors='replace')
+
+def iter_text_blocks(file_path, block_size=READ_BLOCK_SIZE):
+    """
+    Yield a UTF-8 text file as decoded blocks of about block_size bytes.
+    Multi-byte characters split across blocks are decoded correctly.
+    
+    Args:
+        file_path: Path to the text file
+        block_size: Bytes read per block
+    
+    Yields:
+        Decoded text blocks
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start in range(0, len(mm), block_size):
+                yield decoder.decode(mm[start:start + block_size])
+    
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
 
 def load_text_file(file_path):
     """
@@ -15,8 +71,7 @@ def load_text_file(file_path):
     print(f"Loading file: {file_path}")
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            text = file.read()
+        text = read_text_mmap(file_path)
         print(f"✓ File loaded successfully! Length: {len(text)} characters")
         return text
     except FileNotFoundError:
@@ -26,6 +81,90 @@ def load_text_file(file_path):
         print(f"✗ Error loading file: {e}")
         return None
 
+def fast_split(text, chunk_size=500, chunk_overlap=50):
+    """
+    Split text into chunks of at most chunk_size characters.
+    Prefers paragraph, then line, sentence and word breaks. All
+    searching is done by str.rfind/str.find and precompiled regexes
+    (C code), and chunks are sliced straight from the text.
+    
+    Args:
+        text: The text to split
+        chunk_size: Maximum size of each chunk in characters
+        chunk_overlap: Number of characters to overlap between chunks
+    
+    Returns:
+        List of text chunks
+    
+    Raises:
+        ValueError: If chunk_overlap is not smaller than chunk_size
+    """
+    return _split_text(text, chunk_size, chunk_overlap)[0]
+
+def _split_text(text, chunk_size, chunk_overlap, final=True):
+    # With final=False the text is a prefix of a longer stream: stop
+    # before any chunk whose break points depend on text not seen yet,
+    # and return where splitting should resume (with more text appended)
+    if chunk_overlap >= chunk_size:
+        raise ValueError(
+            f"Got a larger chunk overlap ({chunk_overlap}) than chunk size "
+            f"({chunk_size}), should be smaller."
+        )
+    
+    length = len(text)
+    chunks = []
+    start = 0
+    while start < length:
+        # Chunks never start with whitespace
+        if text[start].isspace():
+            match = NON_SPACE_RE.search(text, start)
+            if not match:
+                break
+            start = match.start()
+        
+        limit = start + chunk_size
+        # The longest separator may start at limit and end 2 characters later
+        if not final and limit + 2 > length:
+            return chunks, start
+        if limit >= length:
+            chunks.append(text[start:].rstrip())
+            break
+        
+        # Strongest break that still fills at least half the chunk,
+        # otherwise the furthest break of any kind
+        half = start + chunk_size // 2
+        end = -1
+        for separator, keep in SEPARATORS:
+            pos = text.rfind(separator, start + 1, limit - keep + len(separator))
+            if pos != -1:
+                if pos + keep >= half:
+                    end = pos + keep
+                    break
+                end = max(end, pos + keep)
+        
+        if end == -1:
+            # No break point at all: let LangChain cut this segment
+            match = BREAK_RE.search(text, start)
+            if not final and not match:
+                return chunks, start
+            segment_end = match.start() if match else length
+            fallback_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=len,
+            )
+            chunks.extend(fallback_splitter.split_text(text[start:segment_end]))
+            start = segment_end
+            continue
+        
+        chunks.append(text[start:end].rstrip())
+        
+        # Start the next chunk at the first word inside the overlap
+        pos = text.find(" ", max(end - chunk_overlap, start + 1), end)
+        start = pos + 1 if pos != -1 else end
+    
+    return chunks, length
+
 def split_into_chunks(text, chunk_size=500, chunk_overlap=50):
     """
     Split text into smaller chunks for processing.
@@ -42,15 +181,48 @@ def split_into_chunks(text, chunk_size=500, chunk_overlap=50):
     print(f"Chunk size: {chunk_size} characters")
     print(f"Chunk overlap: {chunk_overlap} characters")
     
-    # Create the text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
-    
     # Split the text
-    chunks = text_splitter.split_text(text)
+    chunks = fast_split(text, chunk_size, chunk_overlap)
+    
+    print(f"✓ Created {len(chunks)} chunks")
+    return chunks
+
+def split_file_into_chunks(file_path, chunk_size=500, chunk_overlap=50):
+    """
+    Split a text file into chunks without loading it all into memory.
+    The file is read in 1 MiB blocks; text near the end of each block,
+    whose break points depend on the next block, is carried over, so the
+    chunks are the same as splitting the whole text at once.
+    
+    Args:
+        file_path: Path to the text file
+        chunk_size: Maximum size of each chunk in characters
+        chunk_overlap: Number of characters to overlap between chunks
+    
+    Returns:
+        List of text chunks (empty if the file could not be read)
+    """
+    print(f"\nSplitting file into chunks: {file_path}")
+    print(f"Chunk size: {chunk_size} characters")
+    print(f"Chunk overlap: {chunk_overlap} characters")
+    
+    chunks = []
+    carry = ""
+    try:
+        for block in iter_text_blocks(file_path):
+            window = carry + block
+            window_chunks, resume = _split_text(window, chunk_size, chunk_overlap, final=False)
+            chunks.extend(window_chunks)
+            carry = window[resume:]
+    except FileNotFoundError:
+        print(f"✗ Error: File not found at {file_path}")
+        return []
+    except Exception as e:
+        print(f"✗ Error loading file: {e}")
+        return []
+    
+    if carry.strip():
+        chunks.extend(fast_split(carry, chunk_size, chunk_overlap))
     
     print(f"✓ Created {len(chunks)} chunks")
     return chunks
@@ -0,0 +1,199 @@
+# embedding_cache.py - Reuse embeddings and indexed documents across runs
+
+from embeddings_storage import encode_chunks
+import numpy as np
+import hashlib
+import sqlite3
+import os
+
+EMBED_CACHE_PATH = "./embed_cache.sqlite"
+
+# Stay below SQLite's limit on "?" parameters per statement
+SQL_BATCH_SIZE = 900
+
+def open_embedding_cache(path=EMBED_CACHE_PATH):
+    """
+    Open (or create) the SQLite embedding cache.
+    
+    Args:
+        path: Location of the SQLite file
+    
+    Returns:
+        sqlite3 connection
+    """
+    cache = sqlite3.connect(path)
+    
+    # Caches written before embeddings were keyed by model can't be
+    # attributed to a backend, so start those tables over
+    for table in ("embeddings", "manifest"):
+        columns = [row[1] for row in cache.execute(f"PRAGMA table_info({table})")]
+        if columns and "model" not in columns:
+            cache.execute(f"DROP TABLE {table}")
+    
+    cache.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        "model TEXT, hash BLOB, emb BLOB, PRIMARY KEY (model, hash))"
+    )
+    cache.execute(
+        "CREATE TABLE IF NOT EXISTS manifest ("
+        "collection TEXT PRIMARY KEY, path TEXT, mtime REAL, hash TEXT, "
+        "chunk_size INTEGER, chunk_overlap INTEGER, num_chunks INTEGER, model TEXT)"
+    )
+    cache.commit()
+    return cache
+
+def model_id(model):
+    """
+    Return the identifier of the model/backend that produced embeddings.
+    ONNX INT8, PyTorch FP32 and FP16 give slightly different vectors,
+    so they must never share cache entries or an index.
+    """
+    return getattr(model, "embedding_backend", type(model).__name__)
+
+def chunk_hash(chunk):
+    """Return the 16-byte content hash used as the cache key."""
+    return hashlib.blake2b(chunk.encode('utf-8'), digest_size=16).digest()
+
+def encode_chunks_cached(chunks, model, cache):
+    """
+    Embed chunks, only running the model on chunks not seen before.
+    
+    Args:
+        chunks: List of text chunks
+        model: Embedding model
+        cache: Connection from open_embedding_cache()
+    
+    Returns:
+        NumPy array of normalized embeddings, in chunk order
+    """
+    model_name = model_id(model)
+    hashes = [chunk_hash(chunk) for chunk in chunks]
+    
+    # Look up all known chunks at once
+    cached = {}
+    unique_hashes = list(set(hashes))
+    for start in range(0, len(unique_hashes), SQL_BATCH_SIZE):
+        batch = unique_hashes[start:start + SQL_BATCH_SIZE]
+        placeholders = ",".join("?" * len(batch))
+        rows = cache.execute(
+            f"SELECT hash, emb FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+            [model_name] + batch
+        )
+        cached.update(rows)
+    
+    # One index per new hash, so repeated chunks are embedded once
+    missing = list({h: i for i, h in enumerate(hashes) if h not in cached}.values())
+    print(f"  Embedding cache: {len(unique_hashes) - len(missing)} hits, {len(missing)} misses")
+    
+    # Only new chunks go through the model
+    if missing:
+        new_embeddings = encode_chunks([chunks[i] for i in missing], model).astype(np.float32)
+        rows = [(hashes[i], emb.tobytes()) for i, emb in zip(missing, new_embeddings)]
+        cache.executemany(
+            "INSERT OR IGNORE INTO embeddings (model, hash, emb) VALUES (?, ?, ?)",
+            [(model_name, h, emb) for h, emb in rows]
+        )
+        cache.commit()
+        cached.update(rows)
+    
+    return np.stack([np.frombuffer(cached[h], dtype=np.float32) for h in hashes])
+
+def file_hash(file_path):
+    """Return the hex content hash of a file, read in 1 MiB blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def is_document_indexed(cache, store_key, file_path, chunk_size, chunk_overlap, model):
+    """
+    Check whether a collection already holds this exact document.
+    
+    Args:
+        cache: Connection from open_embedding_cache()
+        store_key: Key from embeddings_storage.collection_store_key()
+        file_path: Path to the document
+        chunk_size: Chunk size used for indexing
+        chunk_overlap: Chunk overlap used for indexing
+        model: Embedding model that would be used now
+    
+    Returns:
+        True if the stored manifest matches the file, chunk settings and model
+    """
+    if not os.path.exists(file_path):
+        return False
+    
+    row = cache.execute(
+        "SELECT path, mtime, hash, chunk_size, chunk_overlap, model FROM manifest WHERE collection = ?",
+        (store_key,)
+    ).fetchone()
+    if row is None:
+        return False
+    
+    path, mtime, digest, stored_size, stored_overlap, stored_model = row
+    if path != os.path.abspath(file_path) or (stored_size, stored_overlap) != (chunk_size, chunk_overlap):
+        return False
+    if stored_model != model_id(model):
+        return False
+    
+    # Same modification time: unchanged. Otherwise compare the contents.
+    if mtime == os.path.getmtime(file_path):
+        return True
+    return digest == file_hash(file_path)
+
+def record_indexed_document(cache, store_key, file_path, chunk_size, chunk_overlap, num_chunks, model):
+    """
+    Remember which document a collection was built from.
+    
+    Args:
+        cache: Connection from open_embedding_cache()
+        store_key: Key from embeddings_storage.collection_store_key()
+        file_path: Path to the document
+        chunk_size: Chunk size used for indexing
+        chunk_overlap: Chunk overlap used for indexing
+        num_chunks: Number of chunks stored
+        model: Embedding model the chunks were embedded with
+    """
+    cache.execute(
+        "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (store_key, os.path.abspath(file_path), os.path.getmtime(file_path),
+         file_hash(file_path), chunk_size, chunk_overlap, num_chunks, model_id(model))
+    )
+    cache.commit()
+
+# Main execution
+if __name__ == "__main__":
+    from faiss_store import FaissClient
+    from types import SimpleNamespace
+    from embeddings_storage import collection_store_key
+    import tempfile
+    
+    print("Embedding Cache - Testing\n")
+    
+    # Only the model's identifier matters to the manifest
+    model = SimpleNamespace(embedding_backend="manifest-check")
+    
+    with tempfile.TemporaryDirectory() as folder:
+        cache = open_embedding_cache(os.path.join(folder, "cache.sqlite"))
+        doc_path = os.path.join(folder, "doc.txt")
+        binary_key = collection_store_key(FaissClient(folder, binary=True), "docs")
+        float_key = collection_store_key(FaissClient(folder), "docs")
+        
+        # Index version 0 in binary mode
+        with open(doc_path, 'w') as file:
+            file.write("version 0")
+        record_indexed_document(cache, binary_key, doc_path, 400, 50, 1, model)
+        
+        # Change the document and index it in float mode
+        with open(doc_path, 'w') as file:
+            file.write("version 1, changed")
+        assert not is_document_indexed(cache, float_key, doc_path, 400, 50, model)
+        record_indexed_document(cache, float_key, doc_path, 400, 50, 1, model)
+        assert is_document_indexed(cache, float_key, doc_path, 400, 50, model)
+        
+        # Back in binary mode the stored copy still holds version 0
+        assert not is_document_indexed(cache, binary_key, doc_path, 400, 50, model)
+        cache.close()
+    
+    print("✓ Manifest keeps float and binary stores apart")
@@ -1,72 +1,528 @@
-# embeddings_storage.py - Convert text to vectors and store in ChromaDB
+# embeddings_storage.py - Convert text to vectors and store in FAISS or ChromaDB
 
 from sentence_transformers import SentenceTransformer
 import chromadb
+from chromadb import Documents, EmbeddingFunction, Embeddings
 from chromadb.config import Settings
+from tqdm.auto import tqdm
+import numpy as np
+import torch
+import atexit
+import contextlib
+import functools
+import os
+import shutil
 
-def create_embedding_model():
+ONNX_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_MODEL_DIR = "./onnx_model"
+
+# Model used by encode_query(); set by create_embedding_model()
+query_model = None
+
+# ChromaDB HNSW settings: cosine space on normalized vectors, and a
+# larger graph / search beam than Chroma's defaults (same as faiss_store)
+CHROMA_HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
+# Above this many chunks, PyTorch models embed in several processes
+MULTI_PROCESS_MIN_CHUNKS = 1000
+
+# Worker pools started by get_multi_process_pool(), keyed by id(model)
+multi_process_pools = {}
+
+class OnnxEmbeddingModel:
+    """
+    INT8-quantized ONNX Runtime version of all-MiniLM-L6-v2.
+    Exposes the same encode() call as SentenceTransformer so the rest
+    of the pipeline does not need to know which backend is in use.
     """
-    Load the sentence transformer model for creating embeddings.
+    
+    max_seq_length = 256
+    embedding_backend = "all-MiniLM-L6-v2/onnx-int8"
+    
+    def __init__(self, model_dir=ONNX_MODEL_DIR):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        # Export and quantize once, then reuse the files on later runs
+        model_path = os.path.join(model_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            export_quantized_onnx_model(model_dir)
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count()
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+    
+    def encode(self, sentences, batch_size=32, show_progress_bar=False,
+               convert_to_numpy=True, normalize_embeddings=True):
+        """
+        Convert a list of sentences to 384-dimensional vectors.
+        
+        Args:
+            sentences: List of strings to embed
+            batch_size: Number of sentences per inference call
+            show_progress_bar: Show a progress bar while encoding
+            convert_to_numpy: Kept for SentenceTransformer compatibility
+            normalize_embeddings: L2-normalize the output vectors
+        
+        Returns:
+            NumPy array of shape (len(sentences), 384)
+        """
+        batches = range(0, len(sentences), batch_size)
+        embeddings = []
+        for start in tqdm(batches, desc="Batches", disable=not show_progress_bar):
+            features = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            embeddings.append(self.embed_features(features, normalize_embeddings))
+        
+        if not embeddings:
+            return np.zeros((0, 384), dtype=np.float32)
+        return np.concatenate(embeddings)
+    
+    def embed_features(self, features, normalize_embeddings=True):
+        """
+        Run already-tokenized, padded inputs through the model.
+        
+        Args:
+            features: Tokenizer output with NumPy arrays
+            normalize_embeddings: L2-normalize the output vectors
+        
+        Returns:
+            NumPy array of shape (batch, 384)
+        """
+        inputs = {name: features[name].astype(np.int64) for name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+        
+        # Mean pooling over real (non-padding) tokens
+        mask = features["attention_mask"][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        embeddings = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        return embeddings.astype(np.float32)
+
+def export_quantized_onnx_model(model_dir=ONNX_MODEL_DIR):
+    """
+    Export all-MiniLM-L6-v2 to ONNX and apply dynamic INT8 quantization.
+    
+    Args:
+        model_dir: Folder where the quantized model and tokenizer are saved
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import QuantizationConfig
+    from onnxruntime.quantization import QuantFormat, QuantType
+    from transformers import AutoTokenizer
+    
+    print(f"  Exporting {ONNX_MODEL_ID} to ONNX (first run only)...")
+    
+    try:
+        ort_model = ORTModelForFeatureExtraction.from_pretrained(ONNX_MODEL_ID, export=True)
+        ort_model.save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(ONNX_MODEL_ID).save_pretrained(model_dir)
+        
+        quantizer = ORTQuantizer.from_pretrained(model_dir)
+        config = QuantizationConfig(
+            is_static=False,
+            format=QuantFormat.QOperator,
+            activations_dtype=QuantType.QUInt8,
+            weights_dtype=QuantType.QInt8
+        )
+        quantizer.quantize(save_dir=model_dir, quantization_config=config)
+    except BaseException:
+        # Don't leave a half-written model folder for the next run to load
+        shutil.rmtree(model_dir, ignore_errors=True)
+        raise
+    
+    print(f"  ✓ Quantized model saved to {model_dir}")
+
+def select_device():
+    """
+    Pick the fastest available device for PyTorch.
+    
+    Returns:
+        "cuda", "mps" or "cpu"
+    """
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+def create_embedding_model(use_onnx=True):
+    """
+    Load the model for creating embeddings.
+    On a GPU the PyTorch SentenceTransformer is used (FP16 on CUDA).
+    On CPU the INT8 ONNX Runtime model is used when onnxruntime and
+    optimum are installed, otherwise the PyTorch model.
+    
+    Args:
+        use_onnx: Prefer the quantized ONNX Runtime backend on CPU
     
     Returns:
-        SentenceTransformer model
+        OnnxEmbeddingModel or SentenceTransformer model
     """
     print("Loading embedding model...")
     
-    # This model converts text to 384-dimensional vectors
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    device = select_device()
+    
+    model = None
+    if use_onnx and device == "cpu":
+        try:
+            model = OnnxEmbeddingModel()
+            backend = "ONNX Runtime (INT8)"
+        except ImportError as e:
+            print(f"  ONNX Runtime not available ({e}), using PyTorch")
+        except Exception as e:
+            # e.g. first-run export while offline, or a damaged model file;
+            # remove the folder so the next run exports it again
+            print(f"  ONNX model could not be loaded ({e}), using PyTorch")
+            shutil.rmtree(ONNX_MODEL_DIR, ignore_errors=True)
+    
+    if model is None:
+        # This model converts text to 384-dimensional vectors
+        model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+        backend = f"PyTorch ({device})"
+        
+        # encode_chunks() calls the underlying model directly, so make
+        # sure dropout etc. are in inference mode
+        model.eval()
+        
+        if device == "cuda":
+            # Hidden size 384 is a multiple of 8, so FP16 runs on tensor cores
+            model.half()
+            backend = "PyTorch (cuda, FP16)"
+        elif device == "cpu":
+            torch.set_num_threads(os.cpu_count())
+            # Denormal floats are very slow on CPU; treat them as zero
+            torch.set_flush_denormals(True)
+        
+        # Identifies which numbers this model produces (used as cache key).
+        # Not named "backend": SentenceTransformer already uses that attribute
+        model.embedding_backend = f"all-MiniLM-L6-v2/torch-{'fp16' if device == 'cuda' else 'fp32'}"
+    
+    set_query_model(model)
     
     print("✓ Model loaded successfully!")
     print(f"  Model: all-MiniLM-L6-v2")
+    print(f"  Backend: {backend}")
     print(f"  Vector dimensions: 384")
     return model
 
-def create_vector_database():
+@contextlib.contextmanager
+def inference_context(model):
+    """
+    Context for running the model: no autograd bookkeeping at all
+    (torch.inference_mode) and FP16 autocast on CUDA.
+    
+    Args:
+        model: Embedding model
+    """
+    device = getattr(model, "device", None)
+    on_cuda = device is not None and device.type == "cuda"
+    with torch.inference_mode(), torch.autocast(
+        device_type="cuda" if on_cuda else "cpu",
+        dtype=torch.float16,
+        enabled=on_cuda
+    ):
+        yield
+
+def set_query_model(model):
+    """
+    Set the model used by encode_query() and clear its cache.
+    
+    Args:
+        model: Embedding model
+    """
+    global query_model
+    if model is not query_model:
+        query_model = model
+        encode_query.cache_clear()
+
+@functools.lru_cache(maxsize=1024)
+def encode_query(query):
     """
-    Initialize ChromaDB for storing vectors.
+    Embed a single query, caching the result.
+    Repeated questions skip the model entirely.
+    
+    Args:
+        query: Question or search query
     
     Returns:
-        ChromaDB client
+        Normalized float32 embedding as bytes (read back with np.frombuffer)
+    """
+    with inference_context(query_model):
+        embedding = query_model.encode([query], normalize_embeddings=True)[0]
+    return embedding.astype(np.float32).tobytes()
+
+def create_vector_database(backend="faiss", binary_quantize=False):
+    """
+    Initialize the vector database for storing vectors.
+    Uses a local FAISS HNSW index when faiss is installed,
+    otherwise ChromaDB.
+    
+    Args:
+        backend: "faiss" or "chroma"
+        binary_quantize: Store 1-bit embeddings in the FAISS index
+            (32x smaller) and re-rank results with the full vectors
+    
+    Returns:
+        FaissClient or ChromaDB client
     """
     print("\nInitializing vector database...")
     
+    if backend == "faiss":
+        try:
+            from faiss_store import FaissClient
+            
+            # HNSW index: logarithmic search time instead of a full scan
+            client = FaissClient(path="./faiss_db", binary=binary_quantize)
+            
+            print("✓ Database initialized!")
+            print(f"  Backend: FAISS (HNSW{', binary' if binary_quantize else ''})")
+            print(f"  Storage location: ./faiss_db")
+            return client
+        except ImportError as e:
+            print(f"  FAISS not available ({e}), using ChromaDB")
+    
     # Create a persistent client (saves to disk)
     client = chromadb.PersistentClient(path="./chroma_db")
     
     print("✓ Database initialized!")
+    print(f"  Backend: ChromaDB")
     print(f"  Storage location: ./chroma_db")
     return client
 
-def create_or_get_collection(client, collection_name="documents"):
+def collection_store_key(client, collection_name):
+    """
+    Return a key naming one collection in one physical store.
+    FAISS float, FAISS binary and ChromaDB collections with the same
+    name live in different files, so each needs its own manifest entry.
+    
+    Args:
+        client: FaissClient or ChromaDB client
+        collection_name: Name of the collection
+    
+    Returns:
+        String like "faiss-binary:/abs/path/faiss_db:qa_documents"
+    """
+    # FaissClient is recognized by attribute so faiss need not be importable
+    if hasattr(client, "binary"):
+        store = "faiss-binary" if client.binary else "faiss"
+        path = client.path
+    else:
+        store = "chroma"
+        path = client.get_settings().persist_directory
+    return f"{store}:{os.path.abspath(path)}:{collection_name}"
+
+class ModelEmbeddingFunction(EmbeddingFunction):
+    """
+    ChromaDB embedding function backed by our already-loaded model.
+    Lets the collection embed texts itself (e.g. query_texts=...)
+    without loading a second copy of the model.
+    """
+    
+    def __init__(self, model):
+        self.model = model
+    
+    def __call__(self, input: Documents) -> Embeddings:
+        return encode_chunks(list(input), self.model)
+
+def create_or_get_collection(client, collection_name="documents", model=None, fresh=False):
     """
-    Create or retrieve a collection in ChromaDB.
+    Create or retrieve a collection in the vector database.
     A collection is like a table that holds related documents.
     
     Args:
-        client: ChromaDB client
+        client: FaissClient or ChromaDB client
         collection_name: Name for the collection
+        model: Embedding model to register with the collection, so it
+            can embed texts passed without embeddings
+        fresh: Delete any existing collection and start empty
     
     Returns:
         Collection object
     """
     print(f"\nSetting up collection: '{collection_name}'")
     
-    # Get or create collection
-    # This will delete existing collection if it exists (for fresh start)
-    try:
-        client.delete_collection(name=collection_name)
-        print(f"  Deleted existing collection")
-    except:
-        pass
+    # Only delete the existing collection when a fresh start is requested
+    if fresh:
+        try:
+            client.delete_collection(name=collection_name)
+            print(f"  Deleted existing collection")
+        except Exception:
+            pass
+    
+    embedding_function = ModelEmbeddingFunction(model) if model is not None else None
     
-    collection = client.create_collection(
+    # Cosine space: embeddings are normalized, so distance = 1 - dot product
+    collection = client.get_or_create_collection(
         name=collection_name,
-        metadata={"description": "Document chunks with embeddings"}
+        metadata={"description": "Document chunks with embeddings", **CHROMA_HNSW_METADATA},
+        embedding_function=embedding_function
     )
     
-    print(f"✓ Collection ready!")
+    print(f"✓ Collection ready! ({collection.count()} chunks stored)")
     return collection
 
+def embed_features_torch(model, features):
+    """
+    Run already-tokenized, padded inputs through a SentenceTransformer.
+    
+    Args:
+        model: SentenceTransformer model
+        features: Tokenizer output with PyTorch tensors on model.device
+    
+    Returns:
+        NumPy array of normalized embeddings
+    """
+    with inference_context(model):
+        output = model[0].auto_model(**features)
+        token_embeddings = output.last_hidden_state.float()
+        
+        # Mean pooling over real (non-padding) tokens
+        mask = features['attention_mask'].unsqueeze(-1).float()
+        embeddings = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+    return embeddings.cpu().numpy()
+
+def get_multi_process_pool(model):
+    """
+    Start a SentenceTransformer worker pool for the model (once).
+    Uses one worker per GPU on multi-GPU machines, otherwise one
+    worker per CPU core. The pool is stopped when Python exits.
+    
+    Args:
+        model: SentenceTransformer model
+    
+    Returns:
+        Pool for model.encode_multi_process()
+    """
+    pool = multi_process_pools.get(id(model))
+    if pool is not None:
+        return pool
+    
+    if torch.cuda.device_count() > 1:
+        devices = [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+    else:
+        devices = ["cpu"] * os.cpu_count()
+    
+    # One thread per CPU worker, so the workers don't fight over cores
+    saved_threads = os.environ.get("OMP_NUM_THREADS")
+    os.environ["OMP_NUM_THREADS"] = "1"
+    try:
+        pool = model.start_multi_process_pool(target_devices=devices)
+    finally:
+        if saved_threads is None:
+            del os.environ["OMP_NUM_THREADS"]
+        else:
+            os.environ["OMP_NUM_THREADS"] = saved_threads
+    
+    atexit.register(model.stop_multi_process_pool, pool)
+    multi_process_pools[id(model)] = pool
+    print(f"  Started {len(devices)} embedding worker processes")
+    return pool
+
+def encode_chunks(chunks, model, batch_size=64):
+    """
+    Embed chunks in order of token length (smart batching).
+    Similar-length chunks end up in the same batch, so very little
+    compute is wasted on padding tokens. Chunks are tokenized only
+    once; the token IDs are padded per batch and fed to the model.
+    Large inputs on a CPU or multi-GPU PyTorch model are spread over
+    a pool of worker processes instead.
+    
+    Args:
+        chunks: List of text chunks
+        model: Embedding model
+        batch_size: Number of chunks per forward pass
+    
+    Returns:
+        NumPy array of normalized embeddings, in the original chunk order
+    """
+    use_onnx = isinstance(model, OnnxEmbeddingModel)
+    
+    # ONNX Runtime already uses every core; a single GPU gains nothing
+    if (not use_onnx and len(chunks) > MULTI_PROCESS_MIN_CHUNKS
+            and (model.device.type == "cpu" or torch.cuda.device_count() > 1)):
+        pool = get_multi_process_pool(model)
+        return model.encode_multi_process(
+            chunks,
+            pool,
+            batch_size=batch_size,
+            normalize_embeddings=True
+        )
+    
+    tokenizer = model.tokenizer
+    encoded = tokenizer(
+        chunks,
+        padding=False,
+        truncation=True,
+        max_length=model.max_seq_length,
+        return_length=True
+    )
+    order = np.argsort(encoded['length'], kind='stable')
+    keys = [key for key in ('input_ids', 'attention_mask', 'token_type_ids') if key in encoded]
+    
+    batches = []
+    for start in tqdm(range(0, len(chunks), batch_size), desc="Batches"):
+        batch = order[start:start + batch_size]
+        inputs = {key: [encoded[key][i] for i in batch] for key in keys}
+        
+        if use_onnx:
+            features = tokenizer.pad(inputs, return_tensors="np")
+            batches.append(model.embed_features(features))
+        else:
+            features = tokenizer.pad(inputs, return_tensors="pt").to(model.device)
+            batches.append(embed_features_torch(model, features))
+    
+    embeddings_sorted = np.concatenate(batches)
+    
+    # Undo the sort so embeddings line up with the chunks again
+    return embeddings_sorted[np.argsort(order)]
+
+def batched_add(collection, ids, documents, embeddings, batch_size=1000):
+    """
+    Add records to a collection in fixed-size batches.
+    Avoids both one huge insert and many tiny ones. Collections that
+    need an explicit save (FAISS) are persisted once at the end;
+    ChromaDB saves on its own.
+    
+    Args:
+        collection: FAISS or ChromaDB collection
+        ids: List of chunk IDs
+        documents: List of chunk texts
+        embeddings: NumPy array of embeddings
+        batch_size: Records per add() call
+    """
+    for start in range(0, len(ids), batch_size):
+        stop = start + batch_size
+        collection.add(
+            ids=ids[start:stop],
+            documents=documents[start:stop],
+            embeddings=embeddings[start:stop]
+        )
+    
+    if hasattr(collection, "persist"):
+        collection.persist()
+
 def embed_and_store_chunks(chunks, model, collection):
     """
     Convert text chunks to vectors and store in database.
@@ -74,28 +530,24 @@ def embed_and_store_chunks(chunks, model, collection):
     Args:
         chunks: List of text chunks
         model: SentenceTransformer model
-        collection: ChromaDB collection
+        collection: FAISS or ChromaDB collection
     """
     print(f"\nEmbedding {len(chunks)} chunks...")
     
-    # Convert all chunks to vectors at once (batch processing)
-    embeddings = model.encode(chunks, show_progress_bar=True)
+    # Convert all chunks to vectors at once (length-sorted batches)
+    embeddings = encode_chunks(chunks, model)
     
     print(f"✓ Created {len(embeddings)} embeddings")
     print(f"  Each embedding: {len(embeddings[0])} dimensions")
     
-    # Prepare data for ChromaDB
-    # ChromaDB needs: IDs, documents (text), and embeddings (vectors)
+    # Prepare data for the vector database
+    # It needs: IDs, documents (text), and embeddings (vectors)
     ids = [f"chunk_{i}" for i in range(len(chunks))]
     
     print(f"\nStoring in database...")
     
-    # Add to collection
-    collection.add(
-        ids=ids,
-        documents=chunks,
-        embeddings=embeddings.tolist()  # Convert numpy array to list
-    )
+    # Add to collection in batches (NumPy array, no list conversion)
+    batched_add(collection, ids, chunks, embeddings.astype(np.float32))
     
     print(f"✓ Stored {len(chunks)} chunks in database!")
 
@@ -104,7 +556,7 @@ def test_retrieval(collection, query_text, model, n_results=3):
     Test retrieving similar chunks based on a query.
     
     Args:
-        collection: ChromaDB collection
+        collection: FAISS or ChromaDB collection
         query_text: Question or search query
         model: SentenceTransformer model
         n_results: Number of results to retrieve
@@ -115,20 +567,23 @@ def test_retrieval(collection, query_text, model, n_results=3):
     print(f"\nQuery: '{query_text}'")
     
     # Convert query to vector
-    query_embedding = model.encode([query_text])[0]
+    with inference_context(model):
+        query_embedding = model.encode([query_text], normalize_embeddings=True)[0]
     
     # Search for similar chunks
     results = collection.query(
-        query_embeddings=[query_embedding.tolist()],
+        query_embeddings=query_embedding[None, :].astype(np.float32),
         n_results=n_results
     )
     
     print(f"\nFound {len(results['documents'][0])} relevant chunks:")
     print(f"{'-'*60}")
     
+    # Convert distances to similarity scores in one NumPy operation
+    similarities = 1.0 - np.asarray(results['distances'][0], dtype=np.float32)
+    
     # Display results
-    for i, (doc, distance) in enumerate(zip(results['documents'][0], results['distances'][0])):
-        similarity = 1 - distance  # Convert distance to similarity score
+    for i, (doc, similarity) in enumerate(zip(results['documents'][0], similarities)):
         print(f"\nResult {i+1} (Similarity: {similarity:.3f}):")
         print(f"{doc}")
         print(f"{'-'*60}")
@@ -157,7 +612,7 @@ if __name__ == "__main__":
     client = create_vector_database()
     
     # Step 3: Create collection
-    collection = create_or_get_collection(client, "test_documents")
+    collection = create_or_get_collection(client, "test_documents", model, fresh=True)
     
     # Step 4: Embed and store chunks
     embed_and_store_chunks(sample_chunks, model, collection)
@@ -177,5 +632,5 @@ if __name__ == "__main__":
     test_retrieval(collection, "Tell me about NLP", model, n_results=2)
     
     print("\n✅ Embedding and storage test complete!")
-    print(f"\nDatabase location: ./chroma_db")
+    print(f"\nDatabase location: ./faiss_db (FAISS) or ./chroma_db (ChromaDB)")
     print(f"You can delete this folder to reset the database.")
\ No newline at end of file
@@ -0,0 +1,190 @@
+# faiss_store.py - Local FAISS HNSW vector store with a ChromaDB-style interface
+
+import faiss
+import numpy as np
+import os
+import pickle
+
+class FaissCollection:
+    """
+    A named set of chunks stored in a FAISS HNSW index.
+    Supports the add()/query()/count() calls used on ChromaDB
+    collections, so the rest of the pipeline works with either store.
+    Unlike ChromaDB, added chunks are only written to disk by persist().
+    
+    With binary=True the search index holds 1 bit per dimension
+    (48 bytes per chunk instead of 1536). Candidates found by Hamming
+    distance are then re-ranked with the full float32 vectors.
+    """
+    
+    def __init__(self, name, path, dimension=384, load=True, binary=False):
+        self.name = name
+        self.dimension = dimension
+        self.binary = binary
+        
+        # Binary collections get their own files, so switching modes never
+        # loads an index of the wrong type
+        stem = f"{name}-binary" if binary else name
+        self.index_path = os.path.join(path, f"{stem}.index")
+        self.texts_path = os.path.join(path, f"{stem}.pkl")
+        self.vectors_path = os.path.join(path, f"{stem}.npy")
+        
+        if load and os.path.exists(self.index_path) and os.path.exists(self.texts_path):
+            if binary:
+                self.index = faiss.read_index_binary(self.index_path)
+                # Full vectors are only read for re-ranking, so leave them on disk
+                self.vectors = np.load(self.vectors_path, mmap_mode='r')
+            else:
+                self.index = faiss.read_index(self.index_path)
+            with open(self.texts_path, 'rb') as file:
+                stored = pickle.load(file)
+            self.ids = stored['ids']
+            self.documents = stored['documents']
+        else:
+            self.index = self._new_index()
+            self.vectors = np.zeros((0, dimension), dtype=np.float32)
+            self.ids = []
+            self.documents = []
+        
+        # Float vectors added since the last save, merged in one go
+        self.pending_vectors = []
+        
+        self.index.hnsw.efSearch = 64
+    
+    def _new_index(self):
+        if self.binary:
+            # Hamming distance on sign bits of the normalized vectors
+            index = faiss.IndexBinaryHNSW(self.dimension, 32)
+        else:
+            # Inner product on normalized vectors = cosine similarity
+            index = faiss.IndexHNSWFlat(self.dimension, 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        return index
+    
+    def count(self):
+        """Return the number of stored chunks."""
+        return len(self.ids)
+    
+    def add(self, ids, documents, embeddings):
+        """
+        Add chunks and their embeddings (call persist() to save them).
+        
+        Args:
+            ids: List of chunk IDs
+            documents: List of chunk texts
+            embeddings: Array of shape (n, dimension)
+        """
+        vectors = np.array(embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        
+        if self.binary:
+            self.index.add(np.packbits(vectors > 0, axis=1))
+            self.pending_vectors.append(vectors)
+        else:
+            self.index.add(vectors)
+        self.ids.extend(ids)
+        self.documents.extend(documents)
+    
+    def query(self, query_embeddings, n_results=10):
+        """
+        Find the nearest chunks for each query vector.
+        
+        Args:
+            query_embeddings: Array of shape (n_queries, dimension)
+            n_results: Number of chunks to return per query
+        
+        Returns:
+            Dict with 'ids', 'documents' and 'distances' (cosine distance),
+            one list per query, like ChromaDB's query results
+        """
+        queries = np.array(query_embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        faiss.normalize_L2(queries)
+        
+        if self.binary:
+            scores, labels = self._search_binary(queries, n_results)
+        else:
+            scores, labels = self.index.search(queries, n_results)
+        
+        results = {'ids': [], 'documents': [], 'distances': []}
+        for row_scores, row_labels in zip(scores, labels):
+            # FAISS pads with -1 when fewer than n_results chunks exist
+            found = [(label, score) for label, score in zip(row_labels, row_scores) if label != -1]
+            results['ids'].append([self.ids[label] for label, _ in found])
+            results['documents'].append([self.documents[label] for label, _ in found])
+            results['distances'].append([1.0 - float(score) for _, score in found])
+        return results
+    
+    def _merge_pending(self):
+        # One concatenation for all vectors added since the last merge
+        if self.pending_vectors:
+            self.vectors = np.concatenate([self.vectors] + self.pending_vectors)
+            self.pending_vectors = []
+    
+    def _search_binary(self, queries, n_results, n_candidates=100):
+        # Coarse search on bits, then exact dot products on the candidates
+        self._merge_pending()
+        _, candidates = self.index.search(
+            np.packbits(queries > 0, axis=1),
+            max(n_candidates, n_results)
+        )
+        
+        scores = np.full((len(queries), n_results), -np.inf, dtype=np.float32)
+        labels = np.full((len(queries), n_results), -1, dtype=np.int64)
+        for row, (query, row_candidates) in enumerate(zip(queries, candidates)):
+            row_candidates = row_candidates[row_candidates != -1]
+            row_scores = self.vectors[row_candidates] @ query
+            best = np.argsort(-row_scores)[:n_results]
+            scores[row, :len(best)] = row_scores[best]
+            labels[row, :len(best)] = row_candidates[best]
+        return scores, labels
+    
+    def persist(self):
+        """Write the index, chunk texts and (binary mode) vectors to disk."""
+        if self.binary:
+            faiss.write_index_binary(self.index, self.index_path)
+            if self.pending_vectors or not isinstance(self.vectors, np.memmap):
+                # Merging reads the old vectors into memory and releases the
+                # memory map, so the file can be rewritten and mapped again
+                self._merge_pending()
+                np.save(self.vectors_path, self.vectors)
+                self.vectors = np.load(self.vectors_path, mmap_mode='r')
+        else:
+            faiss.write_index(self.index, self.index_path)
+        with open(self.texts_path, 'wb') as file:
+            pickle.dump({'ids': self.ids, 'documents': self.documents}, file)
+    
+    def delete_files(self):
+        """Remove the index and text files from disk."""
+        for file_path in (self.index_path, self.texts_path, self.vectors_path):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+class FaissClient:
+    """
+    Manages FAISS collections saved in one folder.
+    Mirrors the ChromaDB client methods used by embeddings_storage.py.
+    Collections are always queried by embedding, so embedding_function
+    is accepted for compatibility and ignored.
+    """
+    
+    def __init__(self, path="./faiss_db", binary=False):
+        self.path = path
+        self.binary = binary
+        os.makedirs(path, exist_ok=True)
+    
+    def create_collection(self, name, metadata=None, embedding_function=None):
+        """Create a new, empty collection (replacing any saved one)."""
+        collection = FaissCollection(name, self.path, load=False, binary=self.binary)
+        collection.delete_files()
+        return collection
+    
+    def get_or_create_collection(self, name, metadata=None, embedding_function=None):
+        """Load a saved collection, or create an empty one."""
+        return FaissCollection(name, self.path, binary=self.binary)
+    
+    def delete_collection(self, name):
+        """Delete a saved collection."""
+        collection = FaissCollection(name, self.path, load=False, binary=self.binary)
+        if not os.path.exists(collection.index_path):
+            raise ValueError(f"Collection {name} does not exist.")
+        collection.delete_files()
@@ -1,22 +1,36 @@
 # rag_qa_system.py - Complete RAG Q&A System
 
-from document_loader import split_into_chunks
+from document_loader import split_into_chunks, split_file_into_chunks
 from pdf_handler import load_document
-from embeddings_storage import create_embedding_model, create_vector_database, create_or_get_collection
+from embeddings_storage import create_embedding_model, create_vector_database, create_or_get_collection, collection_store_key, encode_chunks, batched_add, inference_context, set_query_model, encode_query
+from embedding_cache import open_embedding_cache, encode_chunks_cached, is_document_indexed, record_indexed_document
 from sentence_transformers import SentenceTransformer
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
-def embed_document(file_path, model, collection, chunk_size=500, chunk_overlap=50):
+OLLAMA_URL = "http://localhost:11434/api/generate"
+
+# One session for all Ollama calls, so the TCP connection is kept alive
+# between questions instead of reconnecting every time
+ollama_session = requests.Session()
+ollama_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+def embed_document(file_path, model, collection, chunk_size=500, chunk_overlap=50, cache=None, store_key=None):
     """
     Load a document, chunk it, embed it, and store in database.
+    With a cache, unchanged documents are not re-indexed and
+    previously seen chunks are not re-embedded.
     
     Args:
         file_path: Path to document
         model: Sentence transformer model
-        collection: ChromaDB collection
+        collection: FAISS or ChromaDB collection
         chunk_size: Size of each chunk
         chunk_overlap: Overlap between chunks
+        cache: Connection from open_embedding_cache(), or None
+        store_key: Key from collection_store_key(), needed with a cache
     
     Returns:
         Number of chunks created
@@ -25,27 +39,41 @@ def embed_document(file_path, model, collection, chunk_size=500, chunk_overlap=5
     print("DOCUMENT PROCESSING")
     print(f"{'='*60}")
     
-    # Step 1: Load document (supports PDF and TXT)
-    text = load_document(file_path)
-    if not text:
-        return 0
+    # Skip everything if the collection already holds this document
+    if (cache is not None and collection.count() > 0
+            and is_document_indexed(cache, store_key, file_path, chunk_size, chunk_overlap, model)):
+        print(f"✓ Document unchanged, reusing stored chunks")
+        print(f"  Total chunks: {collection.count()}")
+        return collection.count()
+    
+    # Step 1 & 2: Load and split into chunks
+    if file_path.lower().endswith('.txt'):
+        # Text files are streamed block by block, never fully in memory
+        chunks = split_file_into_chunks(file_path, chunk_size, chunk_overlap)
+    else:
+        text = load_document(file_path)
+        if not text:
+            return 0
+        chunks = split_into_chunks(text, chunk_size, chunk_overlap)
     
-    # Step 2: Split into chunks
-    chunks = split_into_chunks(text, chunk_size, chunk_overlap)
+    if not chunks:
+        return 0
     
     # Step 3: Create embeddings
     print(f"\nCreating embeddings for {len(chunks)} chunks...")
-    embeddings = model.encode(chunks, show_progress_bar=True)
+    if cache is not None:
+        embeddings = encode_chunks_cached(chunks, model, cache)
+    else:
+        embeddings = encode_chunks(chunks, model)
     
     # Step 4: Store in database
     print(f"\nStoring in vector database...")
     ids = [f"doc_chunk_{i}" for i in range(len(chunks))]
     
-    collection.add(
-        ids=ids,
-        documents=chunks,
-        embeddings=embeddings.tolist()
-    )
+    batched_add(collection, ids, chunks, embeddings.astype(np.float32))
+    
+    if cache is not None:
+        record_indexed_document(cache, store_key, file_path, chunk_size, chunk_overlap, len(chunks), model)
     
     print(f"✓ Successfully processed document!")
     print(f"  Total chunks: {len(chunks)}")
@@ -54,46 +82,66 @@ def embed_document(file_path, model, collection, chunk_size=500, chunk_overlap=5
     
     return len(chunks)
 
-def retrieve_relevant_chunks(query, model, collection, n_results=3):
+def retrieve_relevant_chunks_batch(query_embeddings, collection, n_results=3):
     """
-    Find the most relevant chunks for a query.
+    Find the most relevant chunks for several queries in one search.
     
     Args:
-        query: User's question
-        model: Sentence transformer model
-        collection: ChromaDB collection
-        n_results: Number of chunks to retrieve
+        query_embeddings: NumPy array of normalized query embeddings (one row per query)
+        collection: FAISS or ChromaDB collection
+        n_results: Number of chunks to retrieve per query
     
     Returns:
-        List of relevant chunk texts and their similarity scores
+        List of (chunk texts, NumPy array of similarity scores), one per query
     """
-    # Convert query to embedding
-    query_embedding = model.encode([query])[0]
-    
-    # Search database
+    # Search database (one call for all queries)
     results = collection.query(
-        query_embeddings=[query_embedding.tolist()],
+        query_embeddings=np.asarray(query_embeddings, dtype=np.float32),
         n_results=n_results
     )
     
     # Extract chunks and calculate similarity scores
-    chunks = results['documents'][0]
-    distances = results['distances'][0]
-    similarities = [1 - d for d in distances]  # Convert distance to similarity
+    retrieved = []
+    for chunks, distances in zip(results['documents'], results['distances']):
+        similarities = 1.0 - np.asarray(distances, dtype=np.float32)  # Vectorized
+        retrieved.append((chunks, similarities))
+    return retrieved
+
+def retrieve_relevant_chunks(query, model, collection, n_results=3):
+    """
+    Find the most relevant chunks for a query.
     
-    return chunks, similarities
+    Args:
+        query: User's question, or its precomputed normalized embedding
+        model: Sentence transformer model
+        collection: FAISS or ChromaDB collection
+        n_results: Number of chunks to retrieve
+    
+    Returns:
+        List of relevant chunk texts and a NumPy array of their similarity scores
+    """
+    if isinstance(query, str):
+        # Convert query to embedding (cached for repeated questions)
+        set_query_model(model)
+        query_embedding = np.frombuffer(encode_query(query), dtype=np.float32)
+    else:
+        query_embedding = np.asarray(query, dtype=np.float32)
+    
+    return retrieve_relevant_chunks_batch(query_embedding[None, :], collection, n_results)[0]
 
 def generate_answer_with_ollama(query, context_chunks, model_name="llama3.2"):
     """
     Generate an answer using Ollama with retrieved context.
+    The answer is streamed: tokens are yielded as soon as Ollama
+    produces them instead of waiting for the full response.
     
     Args:
         query: User's question
         context_chunks: List of relevant text chunks
         model_name: Ollama model to use
     
-    Returns:
-        Generated answer
+    Yields:
+        Pieces of the generated answer
     """
     # Combine context chunks into one text
     context = "\n\n".join([f"Context {i+1}:\n{chunk}" for i, chunk in enumerate(context_chunks)])
@@ -111,26 +159,38 @@ Question: {query}
 Answer:"""
     
     # Call Ollama API
-    url = "http://localhost:11434/api/generate"
-    
     payload = {
         "model": model_name,
         "prompt": prompt,
-        "stream": False  # Get complete response at once
+        "stream": True  # Receive tokens as they are generated
     }
     
     try:
-        print("\nGenerating answer with Ollama...")
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        
-        result = response.json()
-        answer = result['response']
-        
-        return answer
+        with ollama_session.post(OLLAMA_URL, json=payload, stream=True) as response:
+            response.raise_for_status()
+            
+            # Ollama sends one JSON object per line
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # Connection dropped part-way through a line
+                    yield "\nError: Ollama sent an incomplete response."
+                    break
+                
+                # Errors can arrive mid-stream, after the 200 status
+                if 'error' in result:
+                    yield f"\nError from Ollama: {result['error']}"
+                    break
+                
+                yield result.get('response', '')
+                if result.get('done'):
+                    break
     
     except requests.exceptions.RequestException as e:
-        return f"Error connecting to Ollama: {e}\nMake sure Ollama is running."
+        yield f"Error connecting to Ollama: {e}\nMake sure Ollama is running."
 
 def display_answer_with_sources(query, answer, chunks, similarities):
     """
@@ -138,7 +198,7 @@ def display_answer_with_sources(query, answer, chunks, similarities):
     
     Args:
         query: User's question
-        answer: Generated answer
+        answer: Generated answer (a string or a stream of tokens)
         chunks: Source chunks used
         similarities: Similarity scores for each chunk
     """
@@ -146,7 +206,12 @@ def display_answer_with_sources(query, answer, chunks, similarities):
     print("ANSWER")
     print(f"{'='*60}")
     print(f"\nQuestion: {query}")
-    print(f"\nAnswer:\n{answer}")
+    print(f"\nAnswer:")
+    
+    # Print tokens as they arrive
+    for token in answer:
+        print(token, end='', flush=True)
+    print()
     
     print(f"\n{'='*60}")
     print("SOURCE CHUNKS (Retrieved Context)")
@@ -163,7 +228,7 @@ def interactive_qa_session(model, collection):
     
     Args:
         model: Sentence transformer model
-        collection: ChromaDB collection
+        collection: FAISS or ChromaDB collection
     """
     print(f"\n{'='*60}")
     print("INTERACTIVE Q&A SESSION")
@@ -192,7 +257,8 @@ def interactive_qa_session(model, collection):
         
         print(f"✓ Found {len(chunks)} relevant chunks")
         
-        # Step 2: Generate answer
+        # Step 2: Generate answer (streamed while displaying)
+        print("\nGenerating answer with Ollama...")
         answer = generate_answer_with_ollama(query, chunks)
         
         # Step 3: Display results
@@ -211,6 +277,7 @@ if __name__ == "__main__":
     COLLECTION_NAME = "qa_documents"
     CHUNK_SIZE = 400
     CHUNK_OVERLAP = 50
+    BINARY_QUANTIZE = False  # 1-bit FAISS index + float re-ranking (32x smaller index)
     
     # You can also ask user for file path
     print("\nDefault document:", DOCUMENT_PATH)
@@ -221,8 +288,14 @@ if __name__ == "__main__":
     # Step 1: Initialize components
     print("\nInitializing system...")
     model = create_embedding_model()
-    client = create_vector_database()
-    collection = create_or_get_collection(client, COLLECTION_NAME)
+    client = create_vector_database(binary_quantize=BINARY_QUANTIZE)
+    cache = open_embedding_cache()
+    
+    # Reuse the stored collection unless the document, chunk settings or model changed
+    # (tracked per store, so FAISS float/binary and ChromaDB never share an entry)
+    store_key = collection_store_key(client, COLLECTION_NAME)
+    fresh = not is_document_indexed(cache, store_key, DOCUMENT_PATH, CHUNK_SIZE, CHUNK_OVERLAP, model)
+    collection = create_or_get_collection(client, COLLECTION_NAME, model, fresh=fresh)
     
     # Step 2: Process document
     num_chunks = embed_document(
@@ -230,7 +303,9 @@ if __name__ == "__main__":
         model, 
         collection,
         chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP
+        chunk_overlap=CHUNK_OVERLAP,
+        cache=cache,
+        store_key=store_key
     )
     
     if num_chunks == 0:
@@ -248,15 +323,22 @@ if __name__ == "__main__":
         "How do neural networks work?"
     ]
     
-    for query in test_queries:
+    # Embed all test queries in one model call and search them in one query
+    with inference_context(model):
+        query_embeddings = model.encode(
+            test_queries,
+            batch_size=len(test_queries),
+            normalize_embeddings=True
+        )
+    retrieved = retrieve_relevant_chunks_batch(query_embeddings, collection, n_results=2)
+    
+    for query, (chunks, similarities) in zip(test_queries, retrieved):
         print(f"\n{'~'*60}")
         print(f"Test Query: {query}")
         print(f"{'~'*60}")
         
-        # Retrieve chunks
-        chunks, similarities = retrieve_relevant_chunks(query, model, collection, n_results=2)
-        
-        # Generate answer
+        # Generate answer (streamed while displaying)
+        print("\nGenerating answer with Ollama...")
         answer = generate_answer_with_ollama(query, chunks)
         
         # Display
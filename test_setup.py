@@ -37,7 +37,36 @@ try:
 except ImportError as e:
     print(f"✗ Requests error: {e}")
 
-# Test 6: Ollama (checking if it's running)
+# Test 6: ONNX Runtime (optional, faster CPU embeddings)
+try:
+    import onnxruntime
+    import optimum.onnxruntime
+    print("✓ ONNX Runtime works!")
+except ImportError as e:
+    print(f"- ONNX Runtime not installed (optional): {e}")
+
+# Test 7: FAISS (optional, faster vector search)
+try:
+    import faiss
+    print("✓ FAISS works!")
+except ImportError as e:
+    print(f"- FAISS not installed (optional): {e}")
+
+# Test 8: pypdfium2 (optional, faster PDF extraction)
+try:
+    import pypdfium2
+    print("✓ pypdfium2 works!")
+except ImportError as e:
+    print(f"- pypdfium2 not installed (optional): {e}")
+
+# Test 9: PyMuPDF (optional, fastest PDF extraction)
+try:
+    import pymupdf
+    print("✓ PyMuPDF works!")
+except ImportError as e:
+    print(f"- PyMuPDF not installed (optional): {e}")
+
+# Test 10: Ollama (checking if it's running)
 try:
     import requests
     response = requests.get("http://localhost:11434")